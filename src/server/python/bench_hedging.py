@@ -0,0 +1,57 @@
+import sys
+import time
+import random
+from hedging import LatencyTracker, hedged_call
+
+# Local fake of the Mistral OCR call: mostly fast, with a slow tail like the
+# occasional huge lease. Latencies are scaled down so the benchmark runs quickly.
+FAST_LATENCY_S = 0.02
+SLOW_LATENCY_S = 0.4
+SLOW_CALL_RATE = 0.03
+
+
+def fake_ocr_process(rng):
+    latency = rng.lognormvariate(0, 0.3) * FAST_LATENCY_S
+    if rng.random() < SLOW_CALL_RATE:
+        latency = SLOW_LATENCY_S
+    time.sleep(latency)
+    return {"document_annotation": None}
+
+
+def percentile(latencies, p):
+    ordered = sorted(latencies)
+    return ordered[min(int(p * len(ordered)), len(ordered) - 1)]
+
+
+def run(num_calls, hedge, seed=0):
+    rng = random.Random(seed)
+    attempt_rngs = [random.Random(rng.random()) for _ in range(num_calls * 2)]
+    tracker = LatencyTracker(hedge_percentile=0.95)
+    latencies = []
+
+    for i in range(num_calls):
+        # Each attempt (original or hedge) draws its own latency
+        attempts = iter(attempt_rngs[i * 2 : i * 2 + 2])
+        start = time.monotonic()
+        if hedge:
+            hedged_call(
+                lambda attempts=attempts: fake_ocr_process(next(attempts)),
+                tracker=tracker,
+            )
+        else:
+            fake_ocr_process(next(attempts))
+        latencies.append(time.monotonic() - start)
+
+    return latencies, tracker.hedge_rate()
+
+
+if __name__ == "__main__":
+    num_calls = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+
+    for hedge in [False, True]:
+        latencies, hedge_rate = run(num_calls, hedge)
+        print(
+            f"hedge={hedge}: p50={percentile(latencies, 0.5) * 1000:.1f}ms "
+            f"p99={percentile(latencies, 0.99) * 1000:.1f}ms "
+            f"hedge_rate={hedge_rate:.1%}"
+        )
@@ -0,0 +1,100 @@
+import sys
+import json
+import time
+from pathlib import Path
+from utils import read_security_deposit_claims, read_folder_contents, get_charge_items
+from estimate import process_claim_by_folder_number
+from routing import ROUTING_POLICIES
+
+# Extracted charges are cached so every policy is scored on the same charges
+# without re-running OCR
+CHARGE_CACHE_PATH = "bench_charge_items.json"
+
+
+def parse_dollars(value):
+    return int(float(value.replace("$", "").replace(",", "") or 0))
+
+
+def load_extracted_charges(folder_numbers, claims_dict):
+    cache = {}
+    if Path(CHARGE_CACHE_PATH).exists():
+        with open(CHARGE_CACHE_PATH, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+
+    for folder_number in folder_numbers:
+        if str(folder_number) in cache:
+            continue
+        claim_data = claims_dict[str(folder_number)]
+        charge_items, found_itemized_doc = get_charge_items(
+            read_folder_contents(str(folder_number)),
+            parse_dollars(claim_data["Amount of Claim"]),
+            claim_data,
+        )
+        cache[str(folder_number)] = [charge_items, found_itemized_doc]
+        with open(CHARGE_CACHE_PATH, "w", encoding="utf-8") as file:
+            json.dump(cache, file, indent=2)
+
+    return cache
+
+
+def benchmark_policy(policy, folder_numbers, claims_dict, extracted, compact=True):
+    errors, latencies, costs, escalations = [], [], [], 0
+    input_tokens, output_tokens = [], []
+    for folder_number in folder_numbers:
+        claim_data = claims_dict[str(folder_number)]
+        start = time.perf_counter()
+        result = process_claim_by_folder_number(
+            folder_number,
+            routing_policy=policy,
+            extracted_charges=tuple(extracted[str(folder_number)]),
+            compact=compact,
+        )
+        latencies.append(time.perf_counter() - start)
+
+        ai_approved_benefit = result.get("approved_benefit", 0) if result else 0
+        actual_approved_benefit = parse_dollars(claim_data["Approved Benefit Amount"])
+        errors.append(abs(ai_approved_benefit - actual_approved_benefit))
+        usage = result.get("usage", {}) if result else {}
+        costs.append(usage.get("cost_usd", 0))
+        input_tokens.append(usage.get("input_tokens", 0))
+        output_tokens.append(usage.get("output_tokens", 0))
+        escalations += usage.get("escalations", 0)
+
+    count = len(folder_numbers)
+    return {
+        "policy": policy,
+        "compact": compact,
+        "mean_abs_error": round(sum(errors) / count, 2),
+        "exact_matches": sum(1 for error in errors if error == 0),
+        "mean_latency_s": round(sum(latencies) / count, 3),
+        "mean_input_tokens": round(sum(input_tokens) / count, 1),
+        "mean_output_tokens": round(sum(output_tokens) / count, 1),
+        "total_cost_usd": round(sum(costs), 4),
+        "escalations": escalations,
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python bench_routing.py 365,373,405 [policy,...] [compact,full]
+    folder_numbers = [int(num.strip()) for num in sys.argv[1].split(",")]
+    policies = sys.argv[2].split(",") if len(sys.argv) > 2 else ROUTING_POLICIES
+    modes = sys.argv[3].split(",") if len(sys.argv) > 3 else ["compact"]
+
+    claims_dict = read_security_deposit_claims()
+    folder_numbers = [
+        num
+        for num in folder_numbers
+        if claims_dict.get(str(num), {}).get("Approved Benefit Amount")
+        and Path(str(num)).is_dir()
+    ]
+    extracted = load_extracted_charges(folder_numbers, claims_dict)
+
+    results = [
+        benchmark_policy(
+            policy, folder_numbers, claims_dict, extracted, mode == "compact"
+        )
+        for policy in policies
+        for mode in modes
+    ]
+    for result in results:
+        print(json.dumps(result))
@@ -85,12 +85,15 @@ DEFAULT_DOCSTRING = """
   """
 
 
+# Company-specific annotation prompts, used when a ledger extractor can't be trusted
+COMPANY_DOCSTRINGS = {
+    "Excalibur Homes": EXCALIBUR_DOCSTRING,
+    "Pure Operating LLC": PURE_OPERATING_LLC_DOCSTRING,
+}
+
+
 def create_analysis_class(mgmt_company: str = ""):
-    docstring = DEFAULT_DOCSTRING
-    if mgmt_company == "Excalibur Homes":
-        docstring = EXCALIBUR_DOCSTRING
-    elif mgmt_company == "Pure Operating LLC":
-        docstring = PURE_OPERATING_LLC_DOCSTRING
+    docstring = COMPANY_DOCSTRINGS.get(mgmt_company, DEFAULT_DOCSTRING)
 
     class CustomChargeAnalysis(BaseModel):
         has_itemized_charges: bool
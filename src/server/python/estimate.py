@@ -1,5 +1,6 @@
 import sys
 import json
+import time
 from pathlib import Path
 import anthropic
 from utils import (
@@ -11,9 +12,183 @@ from utils import (
     parse_date_string,
     get_charge_items,
 )
+from hedging import remaining_time
+from routing import (
+    ROUTING_POLICY,
+    MIN_FAST_AGREEMENT,
+    LARGE_TIER_MIN_TIME_S,
+    choose_tier,
+    next_tier,
+    estimate_cost,
+    valid_coverage_decisions,
+    keyword_agreement,
+)
+
+# Per-claim deadline--past it the speculative backup result is returned
+CLAIM_DEADLINE_S = 180
+
+# Compact mode makes per-charge reasoning optional and short--it's only logged
+COMPACT_COVERAGE_RESPONSES = True
+COMPACT_REASONING_WORDS = 12
+
+# max_tokens budget: tool call overhead plus room for each decision, never below
+# the old flat limit. Per-charge figures are estimates (a 12-word reasoning plus
+# its JSON is ~35 tokens)--recalibrate from the logged output tokens/charge.
+COVERAGE_MIN_TOKENS = 1000
+COVERAGE_BASE_TOKENS = 200
+COVERAGE_TOKENS_PER_CHARGE = 100
+COMPACT_COVERAGE_TOKENS_PER_CHARGE = 50
+COVERAGE_MAX_TOKENS = 8000
+
+COVERAGE_SYSTEM_PROMPT = """Analyze itemized charges for insurance coverage eligibility.
+
+For each charge in order, determine if it's covered by insurance following the given decision rules.
+
+RULES:
+--When in doubt, COVER THE CHARGE
+--COVERED: Repairs, maintenance, cleaning/carpet cleaning, loss of rent, unpaid rent, and anything not mentioned as NOT COVERED
+--NOT COVERED: Fees (asset protection, admin, reletting, amenity service packages, sd deposit charges, late, any other fee), utilities, ANY pet related damages/expenses, RIS plan, pest control, gutter cleaning, HOA violations, renter's insurance, garage rent
+"""
+# Note: Unpaid rent seems to be covered and not covered in different cases
+
+
+def create_coverage_tool(num_charges, compact=False):
+    if compact:
+        reasoning = {
+            "type": "string",
+            "description": f"Optional, at most {COMPACT_REASONING_WORDS} words",
+        }
+        required = ["covered"]
+    else:
+        reasoning = {
+            "type": "string",
+            "description": "Explanation for this coverage decision",
+        }
+        required = ["covered", "reasoning"]
+
+    return {
+        "name": "submit_coverage_analysis",
+        "description": "Submit coverage decision for each charge",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "coverage_decisions": {
+                    "type": "array",
+                    "description": f"Exactly {num_charges} coverage decisions, one for each charge in order",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "covered": {
+                                "type": "boolean",
+                                "description": "True if covered by insurance, false if tenant responsibility",
+                            },
+                            "reasoning": reasoning,
+                        },
+                        "required": required,
+                    },
+                    "minItems": num_charges,
+                    "maxItems": num_charges,
+                }
+            },
+            "required": ["coverage_decisions"],
+        },
+    }
+
+
+def coverage_max_tokens(num_charges, compact=COMPACT_COVERAGE_RESPONSES):
+    per_charge = (
+        COMPACT_COVERAGE_TOKENS_PER_CHARGE if compact else COVERAGE_TOKENS_PER_CHARGE
+    )
+    budget = max(COVERAGE_BASE_TOKENS + per_charge * num_charges, COVERAGE_MIN_TOKENS)
+    return min(budget, COVERAGE_MAX_TOKENS)
 
 
-def analyze_itemized_charge_coverage(charge_items, claim_data, monthly_rent=None):
+def coverage_usage(response, latency_s):
+    return {
+        "input_tokens": response.usage.input_tokens,
+        "output_tokens": response.usage.output_tokens,
+        "latency_s": round(latency_s, 3),
+    }
+
+
+def request_coverage_decisions(client, tier, charge_items, compact, deadline=None):
+    """One coverage call on a model tier. Returns (coverage_decisions, usage).
+
+    Each attempt is timed out at whatever is left of the claim deadline (a
+    time.monotonic() value); raises TimeoutError if none is left.
+    """
+    charges_text = ""
+    for i, item in enumerate(charge_items, 1):
+        charges_text += f"{i}. {item['description']}: ${item['cost']}\n"
+
+    prompt = f"""ITEMIZED CHARGES TO ANALYZE:
+{charges_text}
+Submit exactly {len(charge_items)} coverage decisions, one for each charge in order."""
+
+    tool = create_coverage_tool(len(charge_items), compact)
+    max_tokens = coverage_max_tokens(len(charge_items), compact)
+    usage = None
+    # A truncated tool call gets one retry with double the budget
+    for attempt in range(2):
+        timeout_s = remaining_time(deadline)
+        if timeout_s is not None and timeout_s <= 0:
+            raise TimeoutError("Claim deadline passed before coverage call")
+        # Without a deadline keep the SDK's default timeout (timeout=None disables it)
+        timeout_kwargs = {"timeout": timeout_s} if timeout_s is not None else {}
+
+        start_time = time.perf_counter()
+        response = client.messages.create(
+            model=tier["model"],
+            max_tokens=max_tokens,
+            system=COVERAGE_SYSTEM_PROMPT,
+            messages=[{"role": "user", "content": prompt}],
+            tools=[tool],
+            tool_choice={"type": "tool", "name": "submit_coverage_analysis"},
+            **timeout_kwargs,
+        )
+        call_usage = coverage_usage(response, time.perf_counter() - start_time)
+        call_usage["cost_usd"] = estimate_cost(tier, call_usage)
+        usage = (
+            call_usage
+            if usage is None
+            else {key: usage[key] + call_usage[key] for key in usage}
+        )
+        print(
+            f"Coverage call usage ({tier['model']}): {call_usage}, "
+            f"{call_usage['output_tokens'] / len(charge_items):.1f} output tokens/charge"
+        )
+
+        if (
+            response.stop_reason != "max_tokens"
+            or attempt == 1
+            or max_tokens >= COVERAGE_MAX_TOKENS
+        ):
+            break
+        # The retry writes more tokens, so expect it to take at least as long
+        time_left = remaining_time(deadline)
+        if time_left is not None and time_left < call_usage["latency_s"]:
+            print(f"Coverage call hit max_tokens={max_tokens}, no time left to retry")
+            break
+        print(f"Coverage call hit max_tokens={max_tokens}, retrying")
+        max_tokens = min(max_tokens * 2, COVERAGE_MAX_TOKENS)
+
+    tool_use = response.content[0]
+    if tool_use.type != "tool_use" or tool_use.name != "submit_coverage_analysis":
+        return None, usage
+    result = tool_use.input
+    if not result:
+        return None, usage
+    return result.get("coverage_decisions"), usage  # type: ignore
+
+
+def analyze_itemized_charge_coverage(
+    charge_items,
+    claim_data,
+    monthly_rent=None,
+    compact=COMPACT_COVERAGE_RESPONSES,
+    deadline=None,
+    routing_policy=ROUTING_POLICY,
+):
     # Filter out rent charges that come after lease end date
     lease_end_date_str = claim_data.get("Lease End Date", "").strip()
     if lease_end_date_str:
@@ -49,107 +224,102 @@ def analyze_itemized_charge_coverage(charge_items, claim_data, monthly_rent=None
 
     client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
 
-    charges_text = ""
-    for i, item in enumerate(charge_items, 1):
-        charges_text += f"{i}. {item['description']}: ${item['cost']}\n"
-
-    prompt = f"""Analyze these itemized charges for insurance coverage eligibility.
-
-ITEMIZED CHARGES TO ANALYZE:
-{charges_text}
-
-For each charge in order, determine if it's covered by insurance following the given decision rules.
-
-RULES:
---When in doubt, COVER THE CHARGE
---COVERED: Repairs, maintenance, cleaning/carpet cleaning, loss of rent, unpaid rent, and anything not mentioned as NOT COVERED
---NOT COVERED: Fees (asset protection, admin, reletting, amenity service packages, sd deposit charges, late, any other fee), utilities, ANY pet related damages/expenses, RIS plan, pest control, gutter cleaning, HOA violations, renter's insurance, garage rent
-
-"""
-    # Note: Unpaid rent seems to be covered and not covered in different cases
+    timeout_s = remaining_time(deadline)
+    if timeout_s is not None and timeout_s <= 0:
+        return {"error": "Claim deadline passed before coverage analysis"}
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=1000,
-            messages=[{"role": "user", "content": prompt}],
-            tools=[
-                {
-                    "name": "submit_coverage_analysis",
-                    "description": "Submit coverage decision for each charge",
-                    "input_schema": {
-                        "type": "object",
-                        "properties": {
-                            "coverage_decisions": {
-                                "type": "array",
-                                "description": f"Exactly {len(charge_items)} coverage decisions, one for each charge in order",
-                                "items": {
-                                    "type": "object",
-                                    "properties": {
-                                        "covered": {
-                                            "type": "boolean",
-                                            "description": "True if covered by insurance, false if tenant responsibility",
-                                        },
-                                        "reasoning": {
-                                            "type": "string",
-                                            "description": "Explanation for this coverage decision",
-                                        },
-                                    },
-                                    "required": ["covered", "reasoning"],
-                                },
-                                "minItems": len(charge_items),
-                                "maxItems": len(charge_items),
-                            }
-                        },
-                        "required": ["coverage_decisions"],
-                    },
-                }
-            ],
-            tool_choice={"type": "tool", "name": "submit_coverage_analysis"},
-        )
-
-        tool_use = response.content[0]
-        if tool_use.type == "tool_use" and tool_use.name == "submit_coverage_analysis":
-            result = tool_use.input
-            if not result:
-                return {"error": "No input data from API, using backup calculation"}
-            coverage_decisions = result.get("coverage_decisions")  # type: ignore
-
-            # Sum covered charges
-            total_covered = sum(
-                charge_items[i]["cost"]
-                for i, decision in enumerate(coverage_decisions)
-                if decision.get("covered")
+        # Start on the routed tier, escalating on failed calls, invalid output or
+        # low agreement while the large tier still has time to answer
+        tier = choose_tier(charge_items, routing_policy, timeout_s)
+        usage = None
+        escalations = 0
+        while True:
+            time_left_s = remaining_time(deadline)
+            can_escalate = (
+                routing_policy != "always_fast"
+                and next_tier(tier) is not None
+                and (time_left_s is None or time_left_s >= LARGE_TIER_MIN_TIME_S)
             )
+            escalate_reason = None
+            try:
+                coverage_decisions, call_usage = request_coverage_decisions(
+                    client, tier, charge_items, compact, deadline
+                )
+            except Exception as e:
+                if not can_escalate:
+                    raise
+                escalate_reason = f"API call failed: {str(e)}"
+            else:
+                usage = (
+                    call_usage
+                    if usage is None
+                    else {key: usage[key] + call_usage[key] for key in usage}
+                )
+                if not valid_coverage_decisions(coverage_decisions, len(charge_items)):
+                    escalate_reason = "invalid coverage decisions"
+                elif (
+                    can_escalate
+                    and keyword_agreement(charge_items, coverage_decisions)  # type: ignore
+                    < MIN_FAST_AGREEMENT
+                ):
+                    escalate_reason = "low agreement with coverage rules"
+            if not escalate_reason:
+                break
+
+            if not can_escalate:
+                return {"error": f"Coverage analysis failed: {escalate_reason}"}
+            print(f"Escalating from {tier['model']}: {escalate_reason}")
+            tier = next_tier(tier)
+            escalations += 1
+
+        usage["escalations"] = escalations  # type: ignore
+
+        # Sum covered charges
+        total_covered = sum(
+            charge_items[i]["cost"]
+            for i, decision in enumerate(coverage_decisions)
+            if decision.get("covered")
+        )
 
-            # Apply max benefit cap
-            max_benefit_str = (
-                claim_data.get("Max Benefit").replace("$", "").replace(",", "")
-            )
-            max_benefit = int(float(max_benefit_str))
+        # Apply max benefit cap
+        max_benefit_str = (
+            claim_data.get("Max Benefit").replace("$", "").replace(",", "")
+        )
+        max_benefit = int(float(max_benefit_str))
 
-            # Get claim amount
-            claim_amount_str = (
-                claim_data.get("Amount of Claim").replace("$", "").replace(",", "")
-            )
-            claim_amount = int(float(claim_amount_str))
+        # Get claim amount
+        claim_amount_str = (
+            claim_data.get("Amount of Claim").replace("$", "").replace(",", "")
+        )
+        claim_amount = int(float(claim_amount_str))
 
-            approved_benefit = calculate_approved_benefit(
-                total_covered, max_benefit, claim_amount, monthly_rent, claim_data
-            )
+        approved_benefit = calculate_approved_benefit(
+            total_covered, max_benefit, claim_amount, monthly_rent, claim_data
+        )
 
-            return {
-                "approved_benefit": approved_benefit,
-                "coverage_decisions": coverage_decisions,
-            }
-        else:
-            return {"error": "Unexpected response format"}
+        return {
+            "approved_benefit": approved_benefit,
+            "coverage_decisions": coverage_decisions,
+            "model": tier["model"],  # type: ignore
+            "usage": usage,
+        }
     except Exception as e:
         print("API call failed", str(e))
         return {"error": f"API call failed: {str(e)}"}
 
 
-def process_claim_by_folder_number(folder_number):
+def process_claim_by_folder_number(
+    folder_number,
+    routing_policy=ROUTING_POLICY,
+    extracted_charges=None,
+    compact=COMPACT_COVERAGE_RESPONSES,
+):
+    """Estimate a claim's approved benefit.
+
+    extracted_charges is an optional (charge_items, found_itemized_doc) pair
+    from an earlier get_charge_items run, used to skip extraction.
+    """
     claims_dict = read_security_deposit_claims()
     claim_data = claims_dict.get(str(folder_number))
     if not claim_data:
@@ -168,18 +338,30 @@ def process_claim_by_folder_number(folder_number):
         if monthly_rent_str:
             monthly_rent = int(float(monthly_rent_str))
 
-    folder_info = read_folder_contents(str(folder_number))
+    deadline = time.monotonic() + CLAIM_DEADLINE_S
 
     claim_amount_str = (
         claim_data.get("Amount of Claim").replace("$", "").replace(",", "")  # type: ignore
     )
     claim_amount = int(float(claim_amount_str))
 
-    charge_items, found_itemized_doc = get_charge_items(
-        folder_info,
-        claim_amount,
-        claim_data,
-    )
+    # Backup result is computed up front so a claim that misses its deadline still returns on time
+    backup_result = {
+        "approved_benefit": calculate_approved_benefit(
+            max_benefit, max_benefit, claim_amount, monthly_rent, claim_data
+        )
+    }
+
+    if extracted_charges is not None:
+        charge_items, found_itemized_doc = extracted_charges
+    else:
+        folder_info = read_folder_contents(str(folder_number))
+        charge_items, found_itemized_doc = get_charge_items(
+            folder_info,
+            claim_amount,
+            claim_data,
+            deadline,
+        )
 
     print(f"FINAL ITEMIZED DOC: {charge_items}")
     if found_itemized_doc:
@@ -192,7 +374,12 @@ def process_claim_by_folder_number(folder_number):
                 total_charges >= 0.8 * claim_amount
             ):  # Note: there are one or two docs the AI can't reliably parse--so total_charges can be off.
                 result = analyze_itemized_charge_coverage(
-                    charge_items, claim_data, monthly_rent
+                    charge_items,
+                    claim_data,
+                    monthly_rent,
+                    compact=compact,
+                    deadline=deadline,
+                    routing_policy=routing_policy,
                 )
                 if "error" not in result:
                     return result
@@ -204,20 +391,15 @@ def process_claim_by_folder_number(folder_number):
             print(f"Unexpected empty claim. Moving to backup.")
             pass
 
-    requested_claim_str = (
-        claim_data.get("Amount of Claim").replace("$", "").replace(",", "")  # type: ignore
-    )
-    requested_claim = int(float(requested_claim_str))
+    if remaining_time(deadline) <= 0:  # type: ignore
+        print(f"Claim {folder_number} missed its deadline. Using backup.")
 
-    return {
-        "approved_benefit": calculate_approved_benefit(
-            max_benefit, max_benefit, requested_claim, monthly_rent, claim_data
-        )
-    }
+    return backup_result
 
 
 def process_claims_batch(folder_numbers, row_id=None):
     result_list = []
+    claims_usage = []
     claims_dict = read_security_deposit_claims()
 
     for i, folder_number in enumerate(folder_numbers):
@@ -241,6 +423,8 @@ def process_claims_batch(folder_numbers, row_id=None):
                 "Result for folder ", folder_number, ": ", json.dumps(result, indent=2)
             )
             ai_approved_benefit = result.get("approved_benefit") if result else 0
+            if result and "usage" in result:
+                claims_usage.append(result["usage"])
             actual_approved_benefit_str = (
                 claim_data.get("Approved Benefit Amount") if claim_data else "$0"
             )
@@ -260,10 +444,25 @@ def process_claims_batch(folder_numbers, row_id=None):
         except Exception as e:
             print(f"Error processing folder {folder_number}: {str(e)}")
 
+    print_usage_summary(claims_usage)
+
     if row_id:
         update_database_result(row_id, result_list)
 
 
+def print_usage_summary(claims_usage):
+    # Per-claim averages for comparing compact runs against full ones
+    if not claims_usage:
+        return
+    count = len(claims_usage)
+    print(
+        f"Coverage usage over {count} claims (compact={COMPACT_COVERAGE_RESPONSES}):"
+    )
+    for key in claims_usage[0]:
+        total = sum(usage[key] for usage in claims_usage)
+        print(f"  avg {key}: {round(total / count, 3)}")
+
+
 if __name__ == "__main__":
     try:
         print("starting python script")
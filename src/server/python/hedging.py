@@ -0,0 +1,142 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, Iterable, Callable
+
+# Threads are shared by all hedged calls--losing requests finish in the background
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedged")
+
+
+class LatencyTracker:
+    """Rolling window of observed call latencies, used to decide when to hedge."""
+
+    def __init__(
+        self,
+        hedge_percentile: float = 0.95,
+        window: int = 200,
+        min_samples: int = 10,
+        default_hedge_after_s: Optional[float] = None,
+        samples: Iterable[float] = (),
+        on_record: Optional[Callable[[float], None]] = None,
+        load_samples: Optional[Callable[[], Iterable[float]]] = None,
+    ):
+        """samples (or load_samples, called on first use) seed the window and
+        on_record persists new ones, so the observed percentile carries over
+        between short-lived processes. Loading and persisting are best effort."""
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.default_hedge_after_s = default_hedge_after_s
+        self.latencies = deque(samples, maxlen=window)
+        self.on_record = on_record
+        self.load_samples = load_samples
+        self.calls = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def _load_samples(self):
+        # Called with the lock held
+        if not self.load_samples:
+            return
+        load_samples, self.load_samples = self.load_samples, None
+        try:
+            loaded = list(load_samples())
+        except Exception as e:
+            print(f"Failed to load latency samples: {e}")
+            return
+        samples = loaded + list(self.latencies)
+        self.latencies.clear()
+        self.latencies.extend(samples)
+
+    def record(self, latency_s: float):
+        with self._lock:
+            self._load_samples()
+            self.latencies.append(latency_s)
+        if self.on_record:
+            try:
+                self.on_record(latency_s)
+            except Exception as e:
+                print(f"Failed to persist latency sample: {e}")
+
+    def count_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def count_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        with self._lock:
+            self._load_samples()
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        index = min(int(p * len(ordered)), len(ordered) - 1)
+        return ordered[index]
+
+    def hedge_after(self) -> Optional[float]:
+        """Seconds to wait before sending a hedge (None = don't hedge yet)."""
+        with self._lock:
+            self._load_samples()
+            num_samples = len(self.latencies)
+        if num_samples < self.min_samples:
+            return self.default_hedge_after_s
+        return self.percentile(self.hedge_percentile)
+
+    def hedge_rate(self) -> float:
+        with self._lock:
+            return self.hedges / self.calls if self.calls else 0.0
+
+
+def remaining_time(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left until a time.monotonic() deadline (None = no deadline)."""
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def hedged_call(fn, *args, tracker: LatencyTracker, timeout_s=None, **kwargs):
+    """Call fn, sending one duplicate request if it runs past the hedge latency.
+
+    Returns whichever response arrives first. Raises TimeoutError when neither
+    has finished within timeout_s, or the first error if both calls fail.
+    """
+    start = time.monotonic()
+    deadline = start + timeout_s if timeout_s is not None else None
+    tracker.count_call()
+
+    def timed_call():
+        call_start = time.monotonic()
+        result = fn(*args, **kwargs)
+        tracker.record(time.monotonic() - call_start)
+        return result
+
+    pending = {_executor.submit(timed_call)}
+    hedge_after = tracker.hedge_after()
+    if hedge_after is not None:
+        wait_s = hedge_after
+        if deadline is not None:
+            wait_s = min(wait_s, max(deadline - time.monotonic(), 0))
+        done, _ = wait(pending, timeout=wait_s)
+        if not done and (deadline is None or time.monotonic() < deadline):
+            tracker.count_hedge()
+            pending.add(_executor.submit(timed_call))
+
+    first_error = None
+    while pending:
+        time_left = remaining_time(deadline)
+        done, pending = wait(
+            pending,
+            timeout=max(time_left, 0) if time_left is not None else None,
+            return_when=FIRST_COMPLETED,
+        )
+        if not done:
+            raise TimeoutError(f"Call did not finish within {timeout_s}s")
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                first_error = first_error or e
+
+    raise first_error  # type: ignore
@@ -0,0 +1,339 @@
+import re
+from typing import Optional, Dict, Any, List, Tuple
+
+# Registry of deterministic ledger extractors, keyed by property management company
+LEDGER_EXTRACTORS: Dict[str, Dict[str, Any]] = {}
+
+# Extracted charges must sum to within this fraction of the ledger's balance due
+BALANCE_CHECK_TOLERANCE = 0.02
+
+DATE = r"\d{1,2}/\d{1,2}/\d{2,4}"
+AMOUNT = r"\(?-?\$?\d{1,3}(?:,\d{3})*\.\d{2}\)?"
+DATE_PATTERN = re.compile(DATE)
+AMOUNT_PATTERN = re.compile(AMOUNT)
+# Word start only--the text layer glues columns together ("November rentRent Charge")
+RENT_PATTERN = re.compile(r"\brent(?!er)", re.IGNORECASE)
+# Rent that isn't the unit's rent (whole words, so "carpet" isn't pet rent)
+NOT_UNIT_RENT_PATTERN = re.compile(r"\b(?:garage|pets?)\b", re.IGNORECASE)
+
+# Statement layout (Excalibur): "10/26/22 200.00Admin fee per lease ..." with the
+# description wrapping onto following lines
+STATEMENT_ROW_PATTERN = re.compile(r"^(" + DATE + r")\s+(-?[\d,]+\.\d{2})\s*(.*)$")
+STATEMENT_ROW_END_PATTERN = re.compile(r"^(\d+ Page|Sub Total)\b")
+MAX_CONTINUATION_LINES = 3
+
+# Propertyware layout (Pure Operating): each record starts with its status glued
+# to the transaction date ("Unpaid\nCharge06/19/2024 ...") and ends with the
+# charge/payment and balance columns ("$375.00 $1,025.00")
+PROPERTYWARE_RECORD_PATTERN = re.compile(
+    r"(Unpaid\s+Charge|Partially\s+Paid\s+Charge|Paid\s+Charge|Settled\s+ePayment"
+    r"|Returned\s+Payment\s+Adjustment|Returned\s+Payment"
+    r"|Deposited\s+Payment\s+\(Returned\)|Deposited\s+Payment|Charge\s+Adjustment)"
+    r"\s*(\d{2}/\d{2}/\d{4})"
+)
+PROPERTYWARE_COLUMNS_PATTERN = re.compile(
+    r"(\(?\$[\d,]+\.\d{2}\)?)\s+(\(?\$[\d,]+\.\d{2}\)?)"
+)
+# General ledger account in a Propertyware description ("60000 - Rental Income")
+PROPERTYWARE_ACCOUNT_PATTERN = re.compile(r"\b(\d{4,5}) - ")
+
+
+def register_ledger_extractor(
+    mgmt_company: str,
+    path_keywords: List[str],
+    balance_labels: List[str],
+    parse_rows=None,
+):
+    """Register a ledger-walking algorithm for a property management company.
+
+    path_keywords pick which of the company's documents are ledgers,
+    balance_labels name the total used to cross-check the result, and
+    parse_rows reads the company's text layer (OCR tables are always tried too).
+    """
+
+    def decorator(extract_fn):
+        LEDGER_EXTRACTORS[mgmt_company] = {
+            "path_keywords": path_keywords,
+            "balance_labels": balance_labels,
+            "parse_rows": parse_rows,
+            "extract": extract_fn,
+        }
+        return extract_fn
+
+    return decorator
+
+
+def get_ledger_extractor(mgmt_company: str, file_path: str) -> Optional[Dict]:
+    extractor = LEDGER_EXTRACTORS.get(mgmt_company)
+    if not extractor:
+        return None
+    lowered = file_path.lower()
+    if not any(keyword in lowered for keyword in extractor["path_keywords"]):
+        return None
+    return extractor
+
+
+def parse_amount(amount_str: str) -> float:
+    negative = amount_str.startswith("(") or "-" in amount_str
+    value = float(re.sub(r"[^\d.]", "", amount_str))
+    return -value if negative else value
+
+
+def clean_description(text: str) -> str:
+    return " ".join(text.split())
+
+
+def make_row(date, description, amount, balance=None, status=None):
+    return {
+        "date": date,
+        "description": clean_description(description),
+        "amount": amount,
+        "balance": balance,
+        "status": status,
+    }
+
+
+def parse_statement_rows(text: str) -> List[Dict[str, Any]]:
+    """Rows of a statement text layer: date, amount, then a wrapping description."""
+    rows = []
+    open_row = None
+    continuation_lines = 0
+    for line in text.splitlines():
+        line = line.strip()
+        match = STATEMENT_ROW_PATTERN.match(line)
+        if match:
+            open_row = make_row(
+                match.group(1), match.group(3), parse_amount(match.group(2))
+            )
+            rows.append(open_row)
+            continuation_lines = 0
+        elif (
+            open_row
+            and line
+            and continuation_lines < MAX_CONTINUATION_LINES
+            and not STATEMENT_ROW_END_PATTERN.match(line)
+            and not AMOUNT_PATTERN.search(line)
+        ):
+            open_row["description"] = clean_description(
+                open_row["description"] + " " + line
+            )
+            continuation_lines += 1
+        else:
+            open_row = None
+    return rows
+
+
+def parse_propertyware_rows(text: str) -> List[Dict[str, Any]]:
+    """Rows of a Propertyware lease ledger, newest first, with their status."""
+    rows = []
+    matches = list(PROPERTYWARE_RECORD_PATTERN.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        record = text[match.end() : end]
+        columns = PROPERTYWARE_COLUMNS_PATTERN.search(record)
+        if not columns:
+            continue
+        rows.append(
+            make_row(
+                match.group(2),
+                record[: columns.start()],
+                parse_amount(columns.group(1)),
+                parse_amount(columns.group(2)),
+                clean_description(match.group(1)),
+            )
+        )
+    return rows
+
+
+def parse_table_rows(text: str) -> List[Dict[str, Any]]:
+    """Rows of OCR markdown tables (or any one-line-per-row ledger).
+
+    The first date on a line is the row date, the last amount the running
+    balance and the one before it the entry amount; whatever text is left,
+    before or after the amounts, is the description.
+    """
+    rows = []
+    for line in text.splitlines():
+        line = line.replace("|", " ")
+        date_match = DATE_PATTERN.search(line)
+        amounts = AMOUNT_PATTERN.findall(line)
+        if not date_match or not amounts:
+            continue
+        description = AMOUNT_PATTERN.sub(" ", DATE_PATTERN.sub(" ", line))
+        values = [parse_amount(amount) for amount in amounts]
+        rows.append(
+            make_row(
+                date_match.group(0),
+                description,
+                values[-2] if len(values) >= 2 else values[0],
+                values[-1] if len(values) >= 2 else None,
+            )
+        )
+    return rows
+
+
+def signed_changes(rows: List[Dict[str, Any]], newest_first: bool) -> List[float]:
+    """Change each row makes to the balance, falling back to the entry amount.
+
+    Ledgers with separate charge/payment columns lose their column in the text
+    layer, so the running balance is the reliable sign of an entry.
+    """
+    changes = []
+    for i, row in enumerate(rows):
+        previous_index = i + 1 if newest_first else i - 1
+        previous = rows[previous_index] if 0 <= previous_index < len(rows) else None
+        if (
+            previous
+            and row["balance"] is not None
+            and previous["balance"] is not None
+        ):
+            changes.append(round(row["balance"] - previous["balance"], 2))
+        else:
+            changes.append(row["amount"])
+    return changes
+
+
+def find_balance_due(text: str, balance_labels: List[str]) -> Optional[float]:
+    """Amount for the first balance label found.
+
+    The label may wrap ("Balance\\nDue") and be followed by a run of amounts
+    ("Balance Due0.001,670.00", a summary row), in which case the last is used.
+    """
+    for label in balance_labels:
+        label_pattern = r"\s+".join(re.escape(word) for word in label.split())
+        match = re.search(
+            label_pattern + r"[\s:]*((?:\s*" + AMOUNT + r")+)", text, re.IGNORECASE
+        )
+        if match:
+            return parse_amount(AMOUNT_PATTERN.findall(match.group(1))[-1])
+    return None
+
+
+def to_charge_item(row: Dict[str, Any], cost: float) -> Dict[str, Any]:
+    description = row["description"]
+    return {
+        "cost": int(round(cost)),
+        "description": description,
+        "date": row["date"],
+        "is_rent": bool(RENT_PATTERN.search(description))
+        and not NOT_UNIT_RENT_PATTERN.search(description),
+    }
+
+
+@register_ledger_extractor(
+    "Excalibur Homes",
+    path_keywords=["ledger", "statement"],
+    balance_labels=["balance due"],
+    parse_rows=parse_statement_rows,
+)
+def extract_excalibur_charges(
+    rows: List[Dict[str, Any]],
+) -> List[Tuple[Dict[str, Any], float]]:
+    """Charges below the lowest negative entry (second lowest if it's the final entry)."""
+    changes = signed_changes(rows, newest_first=False)
+    negative_indexes = [i for i, change in enumerate(changes) if change < 0]
+    if not negative_indexes:
+        return [(row, change) for row, change in zip(rows, changes)]
+
+    cutoff = negative_indexes[-1]
+    if cutoff == len(rows) - 1 and len(negative_indexes) > 1:
+        cutoff = negative_indexes[-2]
+
+    return [
+        (rows[i], changes[i]) for i in range(cutoff + 1, len(rows)) if changes[i] > 0
+    ]
+
+
+def is_payment(row: Dict[str, Any], change: float) -> bool:
+    if change >= 0:
+        return False
+    # Without a status column every balance drop is taken as a payment
+    if not row["status"]:
+        return True
+    status = row["status"].lower()
+    return "payment" in status and "adjustment" not in status
+
+
+@register_ledger_extractor(
+    "Pure Operating LLC",
+    path_keywords=["ledger"],
+    balance_labels=["total unpaid"],
+    parse_rows=parse_propertyware_rows,
+)
+def extract_pure_operating_charges(
+    rows: List[Dict[str, Any]],
+) -> List[Tuple[Dict[str, Any], float]]:
+    """Entries above the newest payment, i.e. the first payment where the balance drops.
+
+    Credits above it (charge adjustments) are netted against the charge they
+    adjust rather than emitted as negative charges.
+    """
+    changes = signed_changes(rows, newest_first=True)
+    newest_payment = next(
+        (i for i, change in enumerate(changes) if is_payment(rows[i], change)),
+        len(rows),
+    )
+    return net_credits(
+        [(rows[i], changes[i]) for i in range(newest_payment) if changes[i] != 0]
+    )
+
+
+def net_credits(
+    entries: List[Tuple[Dict[str, Any], float]],
+) -> List[Tuple[Dict[str, Any], float]]:
+    """Subtract each credit from the closest older charge on the same account.
+
+    Entries are newest first. A credit with no such charge is dropped, which
+    leaves the total above the balance due so the cross-check rejects it.
+    """
+    costs = [cost for _, cost in entries]
+    for i, (row, cost) in enumerate(entries):
+        account = PROPERTYWARE_ACCOUNT_PATTERN.search(row["description"])
+        if cost >= 0 or not account:
+            continue
+        for j in range(i + 1, len(entries)):
+            charge_account = PROPERTYWARE_ACCOUNT_PATTERN.search(
+                entries[j][0]["description"]
+            )
+            if (
+                charge_account
+                and charge_account.group(1) == account.group(1)
+                and costs[j] >= -cost
+            ):
+                costs[j] = round(costs[j] + cost, 2)
+                break
+    return [
+        (row, net_cost) for (row, _), net_cost in zip(entries, costs) if net_cost > 0
+    ]
+
+
+def extract_ledger_charges(extractor: Dict, text: str) -> Optional[Dict[str, Any]]:
+    """Run a registered extractor over ledger text.
+
+    Returns a charge analysis like analyze_individual_document_for_charges_ocr,
+    or None when the result fails its balance-due cross-check.
+    """
+    rows = []
+    if extractor["parse_rows"]:
+        rows = extractor["parse_rows"](text)
+    if not rows:
+        rows = parse_table_rows(text)
+    if not rows:
+        print("Ledger extractor found no ledger rows")
+        return None
+
+    selected = extractor["extract"](rows)
+    balance_due = find_balance_due(text, extractor["balance_labels"])
+    total = round(sum(cost for _, cost in selected), 2)
+    if not selected or balance_due is None:
+        print(f"Ledger extractor can't cross-check: total ${total}, due {balance_due}")
+        return None
+    if abs(total - balance_due) > max(1, BALANCE_CHECK_TOLERANCE * abs(balance_due)):
+        print(f"Ledger extractor total ${total} doesn't match balance due ${balance_due}")
+        return None
+
+    print(f"Ledger extractor matched balance due ${balance_due}")
+    return {
+        "has_itemized_charges": True,
+        "charge_items": [to_charge_item(row, cost) for row, cost in selected],
+    }
@@ -0,0 +1,298 @@
+import hashlib
+import sqlite3
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+from PyPDF2 import PdfReader
+
+# SQLite manifest of every claim file, kept next to the claim folders
+MANIFEST_DB_PATH = "claim_manifest.sqlite"
+# estimate.ts runs one estimate.py per request, so writers can overlap
+MANIFEST_LOCK_TIMEOUT_S = 30
+# Bumped whenever the tables below change; connections skip the DDL once it's set
+MANIFEST_SCHEMA_VERSION = 1
+# Latency samples kept per call type for hedging decisions
+LATENCY_WINDOW = 200
+
+# Filename keywords -> detected doc type (first match wins, so order matters)
+DOC_TYPE_KEYWORDS = [
+    ("itemization", ["itemization", "itemized", "disposition", "sec dep disp"]),
+    ("ledger", ["ledger"]),
+    ("statement", ["statement"]),
+    ("invoice", ["invoice"]),
+    ("move_out", ["move out", "move_out", "moveout"]),
+    ("demand", ["demand"]),
+    ("addendum", ["addendum", "waiver", "fee in lieu"]),
+    ("lease", ["lease"]),
+    ("letter", ["letter", "reciept", "receipt"]),
+    ("application", ["application"]),
+    ("contact", ["tenant contact"]),
+    ("paystub", ["paystub"]),
+    ("identity", ["govt_id", "social"]),
+]
+
+# Doc types that never carry charges--the extraction pipeline skips these
+NON_CHARGE_DOC_TYPES = {"application", "contact", "paystub", "identity"}
+
+# Doc types most likely to hold the itemized charges are analyzed first
+DOC_TYPE_PRIORITY = ["itemization", "ledger", "statement", "invoice", "move_out"]
+
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".tiff", ".bmp"]
+
+
+def _connect(db_path: str = MANIFEST_DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=MANIFEST_LOCK_TIMEOUT_S)
+    conn.row_factory = sqlite3.Row
+    # Default rollback journal--WAL doesn't work on network filesystems
+    if conn.execute("PRAGMA user_version").fetchone()[0] != MANIFEST_SCHEMA_VERSION:
+        _create_schema(conn)
+    return conn
+
+
+def _create_schema(conn: sqlite3.Connection):
+    conn.executescript(
+        f"""
+        CREATE TABLE IF NOT EXISTS folders (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            folder TEXT NOT NULL,
+            name TEXT NOT NULL,
+            extension TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            page_count INTEGER NOT NULL,
+            doc_type TEXT NOT NULL,
+            has_text_layer INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+        CREATE TABLE IF NOT EXISTS document_text (
+            sha256 TEXT PRIMARY KEY,
+            source TEXT NOT NULL,
+            text TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS call_latencies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            call_name TEXT NOT NULL,
+            latency_s REAL NOT NULL
+        );
+        PRAGMA user_version = {MANIFEST_SCHEMA_VERSION};
+        """
+    )
+
+
+def hash_file(file_path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def detect_doc_type(file_name: str, extension: str) -> str:
+    """Classify a claim file by its name, falling back to 'image'/'other'."""
+    lowered = file_name.lower()
+    for doc_type, keywords in DOC_TYPE_KEYWORDS:
+        if any(keyword in lowered for keyword in keywords):
+            return doc_type
+    if extension in IMAGE_EXTENSIONS:
+        return "image"
+    return "other"
+
+
+def inspect_document(file_path: Path, extension: str) -> tuple[int, bool]:
+    """Return (page_count, has_text_layer) for a claim file."""
+    if extension == ".pdf":
+        try:
+            with open(file_path, "rb") as file:
+                pdf_reader = PdfReader(file)
+                page_count = len(pdf_reader.pages)
+                first_page_text = (
+                    pdf_reader.pages[0].extract_text() if page_count else ""
+                )
+                return page_count, bool(first_page_text and first_page_text.strip())
+        except Exception as e:
+            print(f"Error inspecting {file_path}: {e}")
+            return -1, False
+    if extension == ".docx":
+        return 1, True
+    return 1, False
+
+
+def _row_to_file_info(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "name": row["name"],
+        "path": row["path"],
+        "extension": row["extension"],
+        "size_bytes": row["size_bytes"],
+        "mtime_ns": row["mtime_ns"],
+        "sha256": row["sha256"],
+        "page_count": row["page_count"],
+        "doc_type": row["doc_type"],
+        "has_text_layer": bool(row["has_text_layer"]),
+    }
+
+
+def _refresh_folder(conn: sqlite3.Connection, folder_path: Path, folder_mtime_ns: int):
+    folder_key = str(folder_path)
+    known = {
+        row["path"]: row
+        for row in conn.execute("SELECT * FROM files WHERE folder = ?", (folder_key,))
+    }
+    seen = set()
+    changed = []
+
+    # Hash and inspect before writing anything--holding the write lock through
+    # slow reads would block every other estimate.py writing to the manifest
+    for file_path in folder_path.iterdir():
+        if not file_path.is_file():
+            continue
+        path_key = str(file_path)
+        seen.add(path_key)
+        stat = file_path.stat()
+        existing = known.get(path_key)
+        # Only re-hash/re-classify files whose size or mtime changed
+        if (
+            existing
+            and existing["mtime_ns"] == stat.st_mtime_ns
+            and existing["size_bytes"] == stat.st_size
+        ):
+            continue
+
+        extension = file_path.suffix.lower()
+        page_count, has_text_layer = inspect_document(file_path, extension)
+        changed.append(
+            (
+                path_key,
+                folder_key,
+                file_path.name,
+                extension,
+                stat.st_size,
+                stat.st_mtime_ns,
+                hash_file(file_path),
+                page_count,
+                detect_doc_type(file_path.name, extension),
+                int(has_text_layer),
+            )
+        )
+
+    removed = [path for path in known if path not in seen]
+    with conn:
+        conn.executemany(
+            """INSERT OR REPLACE INTO files
+            (path, folder, name, extension, size_bytes, mtime_ns, sha256, page_count, doc_type, has_text_layer)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            changed,
+        )
+        conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+        conn.execute(
+            "INSERT OR REPLACE INTO folders (path, mtime_ns) VALUES (?, ?)",
+            (folder_key, folder_mtime_ns),
+        )
+
+
+def get_folder_manifest(
+    folder_path, refresh: bool = False, db_path: str = MANIFEST_DB_PATH
+) -> List[Dict[str, Any]]:
+    """Return manifest entries for a claim folder.
+
+    The folder is only re-walked when its mtime changes (a file was added,
+    removed or renamed) or when refresh=True, which is needed to pick up a
+    file edited in place. Only changed files are re-hashed and re-classified.
+    """
+    folder_path = Path(folder_path)
+    folder_mtime_ns = folder_path.stat().st_mtime_ns
+
+    conn = _connect(db_path)
+    try:
+        cached = conn.execute(
+            "SELECT mtime_ns FROM folders WHERE path = ?", (str(folder_path),)
+        ).fetchone()
+        if refresh or not cached or cached["mtime_ns"] != folder_mtime_ns:
+            _refresh_folder(conn, folder_path, folder_mtime_ns)
+        rows = conn.execute(
+            "SELECT * FROM files WHERE folder = ? ORDER BY name", (str(folder_path),)
+        ).fetchall()
+        return [_row_to_file_info(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def plan_extraction(folder_info: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop files that never carry charges and order likely itemized docs first."""
+
+    def priority(file_info: Dict[str, Any]) -> int:
+        doc_type = file_info.get("doc_type", "other")
+        if doc_type in DOC_TYPE_PRIORITY:
+            return DOC_TYPE_PRIORITY.index(doc_type)
+        return len(DOC_TYPE_PRIORITY)
+
+    planned = [
+        file_info
+        for file_info in folder_info
+        if file_info.get("doc_type") not in NON_CHARGE_DOC_TYPES
+    ]
+    return sorted(planned, key=priority)
+
+
+def get_cached_text(sha256: str, db_path: str = MANIFEST_DB_PATH) -> Optional[str]:
+    """Return the cached text layer/OCR text pass for a file's content hash."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT text FROM document_text WHERE sha256 = ?", (sha256,)
+        ).fetchone()
+        return row["text"] if row else None
+    finally:
+        conn.close()
+
+
+def store_cached_text(
+    sha256: str, source: str, text: str, db_path: str = MANIFEST_DB_PATH
+):
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO document_text (sha256, source, text) VALUES (?, ?, ?)",
+            (sha256, source, text),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def load_call_latencies(
+    call_name: str, db_path: str = MANIFEST_DB_PATH
+) -> List[float]:
+    """Most recent latency samples for a call type, oldest first."""
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT latency_s FROM call_latencies WHERE call_name = ? ORDER BY id DESC LIMIT ?",
+            (call_name, LATENCY_WINDOW),
+        ).fetchall()
+        return [row["latency_s"] for row in reversed(rows)]
+    finally:
+        conn.close()
+
+
+def store_call_latency(
+    call_name: str, latency_s: float, db_path: str = MANIFEST_DB_PATH
+):
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "INSERT INTO call_latencies (call_name, latency_s) VALUES (?, ?)",
+            (call_name, latency_s),
+        )
+        conn.execute(
+            """DELETE FROM call_latencies WHERE call_name = ? AND id NOT IN (
+                SELECT id FROM call_latencies WHERE call_name = ? ORDER BY id DESC LIMIT ?
+            )""",
+            (call_name, call_name, LATENCY_WINDOW),
+        )
+        conn.commit()
+    finally:
+        conn.close()
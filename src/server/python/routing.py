@@ -0,0 +1,166 @@
+import re
+from typing import Optional, Dict, Any, List
+
+# Model tiers for coverage analysis, cheapest first. Prices are USD per million tokens.
+MODEL_TIERS = [
+    {
+        "name": "fast",
+        "model": "claude-3-5-haiku-20241022",
+        "input_cost_per_mtok": 0.8,
+        "output_cost_per_mtok": 4.0,
+    },
+    {
+        "name": "large",
+        "model": "claude-sonnet-4-20250514",
+        "input_cost_per_mtok": 3.0,
+        "output_cost_per_mtok": 15.0,
+    },
+]
+
+# size_aware policy: claims this small and clear-cut go to the fast tier
+MAX_FAST_CHARGES = 12
+MAX_FAST_AMBIGUOUS = 2
+# Fast-tier answers must agree this often with the keyword rules or get escalated
+MIN_FAST_AGREEMENT = 0.8
+# Claim time (seconds) the large tier needs, for routing and escalation
+LARGE_TIER_MIN_TIME_S = 30
+
+ROUTING_POLICIES = ["always_large", "always_fast", "size_aware"]
+ROUTING_POLICY = "size_aware"
+
+# Rough keyword versions of the coverage RULES, used to spot ambiguous charges.
+# Keywords match whole words (plus a plural "s"/"es"), so "gas" doesn't match
+# "gasket" or "pet" "petition"
+COVERED_KEYWORDS = [
+    "repair",
+    "replace",
+    "replacement",
+    "maintenance",
+    "clean",
+    "cleaning",
+    "carpet",
+    "paint",
+    "painting",
+    "damage",
+    "rent",
+    "rental",
+    "trash",
+    "hauling",
+    "key",
+    "rekey",
+    "lock",
+    "blinds",
+]
+NOT_COVERED_KEYWORDS = [
+    "fee",
+    "utility",
+    "utilities",
+    "water",
+    "sewer",
+    "electric",
+    "gas",
+    "pet",
+    "pest",
+    "gutter",
+    "hoa",
+    "insurance",
+    "garage",
+    "ris",
+    "admin",
+    "reletting",
+    "asset protection",
+    "amenity",
+]
+
+
+def _keyword_pattern(keywords: List[str]) -> re.Pattern:
+    alternatives = "|".join(re.escape(k) for k in keywords)
+    return re.compile(r"\b(?:" + alternatives + r")(?:s|es)?\b")
+
+
+COVERED_PATTERN = _keyword_pattern(COVERED_KEYWORDS)
+NOT_COVERED_PATTERN = _keyword_pattern(NOT_COVERED_KEYWORDS)
+
+
+def keyword_coverage(description: str) -> Optional[bool]:
+    """Coverage implied by the rule keywords, or None when ambiguous."""
+    lowered = description.lower()
+    covered = bool(COVERED_PATTERN.search(lowered))
+    not_covered = bool(NOT_COVERED_PATTERN.search(lowered))
+    if not_covered and not covered:
+        return False
+    if covered and not not_covered:
+        return True
+    return None
+
+
+def count_ambiguous(charge_items: List[Dict[str, Any]]) -> int:
+    return sum(
+        1 for item in charge_items if keyword_coverage(item["description"]) is None
+    )
+
+
+def get_tier(name: str) -> Dict[str, Any]:
+    return next(tier for tier in MODEL_TIERS if tier["name"] == name)
+
+
+def estimate_cost(tier: Dict[str, Any], usage: Dict[str, Any]) -> float:
+    """USD cost of a coverage call."""
+    input_cost = tier["input_cost_per_mtok"] * usage["input_tokens"]
+    output_cost = tier["output_cost_per_mtok"] * usage["output_tokens"]
+    return (input_cost + output_cost) / 1_000_000
+
+
+def choose_tier(
+    charge_items: List[Dict[str, Any]],
+    policy: str = ROUTING_POLICY,
+    time_left_s: Optional[float] = None,
+    min_large_time_s: float = LARGE_TIER_MIN_TIME_S,
+) -> Dict[str, Any]:
+    """Pick a model tier from the number of charges, ambiguity and time budget."""
+    if policy == "always_large":
+        return get_tier("large")
+    if policy == "always_fast":
+        return get_tier("fast")
+    if policy != "size_aware":
+        raise ValueError(f"Unknown routing policy: {policy}")
+
+    # Not enough of the claim deadline left for the large model
+    if time_left_s is not None and time_left_s < min_large_time_s:
+        return get_tier("fast")
+    if (
+        len(charge_items) <= MAX_FAST_CHARGES
+        and count_ambiguous(charge_items) <= MAX_FAST_AMBIGUOUS
+    ):
+        return get_tier("fast")
+    return get_tier("large")
+
+
+def next_tier(tier: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    index = MODEL_TIERS.index(tier)
+    return MODEL_TIERS[index + 1] if index + 1 < len(MODEL_TIERS) else None
+
+
+def valid_coverage_decisions(coverage_decisions, num_charges: int) -> bool:
+    return (
+        isinstance(coverage_decisions, list)
+        and len(coverage_decisions) == num_charges
+        and all(
+            isinstance(decision, dict) and isinstance(decision.get("covered"), bool)
+            for decision in coverage_decisions
+        )
+    )
+
+
+def keyword_agreement(
+    charge_items: List[Dict[str, Any]], coverage_decisions: List[Dict[str, Any]]
+) -> float:
+    """Share of clear-cut charges where the model agrees with the rule keywords."""
+    clear_cut = [
+        (expected, decision["covered"])
+        for item, decision in zip(charge_items, coverage_decisions)
+        if (expected := keyword_coverage(item["description"])) is not None
+    ]
+    if not clear_cut:
+        return 1.0
+    return sum(1 for expected, got in clear_cut if expected == got) / len(clear_cut)
@@ -0,0 +1,85 @@
+import time
+from types import SimpleNamespace
+from estimate import (
+    COVERAGE_MAX_TOKENS,
+    COVERAGE_MIN_TOKENS,
+    coverage_max_tokens,
+    create_coverage_tool,
+    request_coverage_decisions,
+)
+from routing import get_tier
+
+CHARGE_ITEMS = [
+    {"description": "Carpet cleaning", "cost": 300},
+    {"description": "Late fee", "cost": 190},
+]
+DECISIONS = [{"covered": True}, {"covered": False}]
+
+
+class FakeMessages:
+    def __init__(self, stop_reasons, delay_s=0):
+        self.stop_reasons = list(stop_reasons)
+        self.delay_s = delay_s
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        time.sleep(self.delay_s)
+        return SimpleNamespace(
+            stop_reason=self.stop_reasons.pop(0),
+            usage=SimpleNamespace(input_tokens=500, output_tokens=80),
+            content=[
+                SimpleNamespace(
+                    type="tool_use",
+                    name="submit_coverage_analysis",
+                    input={"coverage_decisions": DECISIONS},
+                )
+            ],
+        )
+
+
+def test_coverage_max_tokens_never_below_old_limit():
+    assert coverage_max_tokens(2) == COVERAGE_MIN_TOKENS
+    compact_budget = coverage_max_tokens(40, compact=True)
+    assert compact_budget < coverage_max_tokens(40, compact=False)
+    assert coverage_max_tokens(500) == COVERAGE_MAX_TOKENS
+
+
+def test_coverage_tool_counts_and_compact_reasoning():
+    full = create_coverage_tool(2)["input_schema"]["properties"]["coverage_decisions"]
+    compact = create_coverage_tool(2, compact=True)["input_schema"]["properties"][
+        "coverage_decisions"
+    ]
+    assert full["minItems"] == full["maxItems"] == 2
+    assert compact["minItems"] == compact["maxItems"] == 2
+    assert full["items"]["required"] == ["covered", "reasoning"]
+    assert compact["items"]["required"] == ["covered"]
+
+
+def test_truncated_call_is_retried_with_a_bigger_budget():
+    messages = FakeMessages(["max_tokens", "tool_use"])
+    client = SimpleNamespace(messages=messages)
+    decisions, usage = request_coverage_decisions(
+        client, get_tier("fast"), CHARGE_ITEMS, True, time.monotonic() + 60
+    )
+    assert decisions == DECISIONS
+    assert usage["output_tokens"] == 160
+    assert messages.calls[1]["max_tokens"] == 2 * messages.calls[0]["max_tokens"]
+    assert messages.calls[1]["timeout"] < messages.calls[0]["timeout"]
+
+
+def test_retry_skipped_without_time_left():
+    messages = FakeMessages(["max_tokens", "tool_use"], delay_s=0.2)
+    client = SimpleNamespace(messages=messages)
+    request_coverage_decisions(
+        client, get_tier("fast"), CHARGE_ITEMS, True, time.monotonic() + 0.3
+    )
+    assert len(messages.calls) == 1
+
+
+def test_no_deadline_keeps_sdk_default_timeout():
+    messages = FakeMessages(["tool_use"])
+    request_coverage_decisions(
+        SimpleNamespace(messages=messages), get_tier("fast"), CHARGE_ITEMS, False
+    )
+    assert "timeout" not in messages.calls[0]
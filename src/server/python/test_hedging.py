@@ -0,0 +1,62 @@
+import time
+from hedging import LatencyTracker, hedged_call
+from utils import process_ocr
+
+
+def test_seeded_samples_enable_percentile_hedging():
+    recorded = []
+    tracker = LatencyTracker(
+        hedge_percentile=0.5,
+        min_samples=3,
+        default_hedge_after_s=30,
+        samples=[0.01, 0.02, 0.03],
+        on_record=recorded.append,
+    )
+    assert tracker.hedge_after() == 0.02
+
+    tracker.record(0.04)
+    assert recorded == [0.04]
+
+
+def test_hedge_returns_first_response():
+    tracker = LatencyTracker(min_samples=1, samples=[0.01])
+    delays = iter([1.0, 0.0])
+
+    def slow_then_fast():
+        delay = next(delays)
+        time.sleep(delay)
+        return delay
+
+    start = time.monotonic()
+    assert hedged_call(slow_then_fast, tracker=tracker) == 0.0
+    assert time.monotonic() - start < 0.5
+    assert tracker.hedge_rate() == 1.0
+
+
+def test_samples_load_lazily_and_load_failures_are_ignored():
+    def load_samples():
+        raise RuntimeError("database is locked")
+
+    tracker = LatencyTracker(default_hedge_after_s=30, load_samples=load_samples)
+    assert tracker.hedge_after() == 30
+
+    tracker = LatencyTracker(min_samples=1, load_samples=lambda: [0.05])
+    tracker.record(0.01)
+    assert list(tracker.latencies) == [0.05, 0.01]
+
+
+def test_hedged_ocr_only_gets_time_left():
+    timeouts_ms = []
+
+    class FakeOCR:
+        def process(self, timeout_ms, **kwargs):
+            timeouts_ms.append(timeout_ms)
+            time.sleep(0.3 if len(timeouts_ms) == 1 else 0)
+
+    client = type("FakeClient", (), {"ocr": FakeOCR()})()
+    tracker = LatencyTracker(min_samples=1, samples=[0.1])
+    hedged_call(
+        process_ocr, client, time.monotonic() + 1, tracker=tracker, timeout_s=1
+    )
+    assert timeouts_ms[0] > 900
+    assert timeouts_ms[1] < 950
@@ -0,0 +1,92 @@
+from pathlib import Path
+from PyPDF2 import PdfReader
+from ledger_extractors import (
+    LEDGER_EXTRACTORS,
+    extract_ledger_charges,
+    find_balance_due,
+    parse_table_rows,
+    to_charge_item,
+)
+
+
+CLAIMS_DIR = Path(__file__).parent
+
+
+def read_text_layer(path):
+    with open(CLAIMS_DIR / path, "rb") as file:
+        return "\n".join(page.extract_text() for page in PdfReader(file).pages)
+
+
+def extracted_total(mgmt_company, path):
+    result = extract_ledger_charges(
+        LEDGER_EXTRACTORS[mgmt_company], read_text_layer(path)
+    )
+    assert result is not None
+    return result, sum(item["cost"] for item in result["charge_items"])
+
+
+def test_excalibur_ledger_365():
+    result, total = extracted_total(
+        "Excalibur Homes", "365/2657 Artillery Point - Ledger.pdf"
+    )
+    assert total == 1670
+    assert all(item["description"] for item in result["charge_items"])
+
+
+def test_excalibur_ledger_366_marks_rent():
+    result, total = extracted_total("Excalibur Homes", "366/985 Fair Street - Ledger.pdf")
+    assert total == 2574
+    assert [item["is_rent"] for item in result["charge_items"]] == [
+        True,
+        False,
+        False,
+        False,
+    ]
+
+
+def test_pure_operating_ledger_512():
+    result, total = extracted_total(
+        "Pure Operating LLC", "512/Ledger - 9396 Hoffman Pl.pdf"
+    )
+    assert total == 1025
+    assert [item["cost"] for item in result["charge_items"]] == [375, 125, 525]
+
+
+def test_pure_operating_credits_net_against_their_charge():
+    result, total = extracted_total(
+        "Pure Operating LLC", "623/Ledger - 6605 CottonCreek.pdf"
+    )
+    assert all(item["cost"] > 0 for item in result["charge_items"])
+    april_rent = [
+        item
+        for item in result["charge_items"]
+        if item["date"] == "04/01/2024" and item["is_rent"]
+    ]
+    # "adjust April rent" credits $749.59 of the $1,900 April rent
+    assert [item["cost"] for item in april_rent] == [1150]
+
+
+def test_is_rent_excludes_pet_and_garage_words_only():
+    def is_rent(description):
+        return to_charge_item({"description": description, "date": None}, 1)["is_rent"]
+
+    assert is_rent("Rent after carpet replacement")
+    assert not is_rent("Pet rent")
+    assert not is_rent("Garage rent")
+
+
+def test_failed_cross_check_falls_back():
+    text = read_text_layer("368/773 Corundum Court - Ledger.pdf")
+    assert extract_ledger_charges(LEDGER_EXTRACTORS["Excalibur Homes"], text) is None
+
+
+def test_balance_due_label_and_amount_on_different_lines():
+    assert find_balance_due("Sub Total\nBalance Due0.001,670.00", ["balance due"]) == 1670
+    assert find_balance_due("Total Unpaid\n$1,025.00Deposit", ["total unpaid"]) == 1025
+
+
+def test_table_rows_description_after_amount():
+    rows = parse_table_rows("| 10/26/22 | 200.00 | Admin fee per lease | 1,200.00 |")
+    assert rows[0]["description"] == "Admin fee per lease"
+    assert rows[0]["amount"] == 200
+    assert rows[0]["balance"] == 1200
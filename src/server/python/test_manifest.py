@@ -0,0 +1,56 @@
+import os
+import manifest
+from manifest import get_folder_manifest, plan_extraction, store_cached_text
+
+
+def test_file_overwritten_in_place_is_refreshed(tmp_path):
+    folder = tmp_path / "512"
+    folder.mkdir()
+    ledger = folder / "Ledger - 9396 Hoffman Pl.docx"
+    ledger.write_bytes(b"a")
+    db_path = str(tmp_path / "manifest.sqlite")
+
+    first = get_folder_manifest(folder, db_path=db_path)[0]
+    folder_mtime_ns = folder.stat().st_mtime_ns
+
+    ledger.write_bytes(b"abcdef")
+    # Overwriting a file doesn't touch the folder mtime
+    os.utime(folder, ns=(folder_mtime_ns, folder_mtime_ns))
+
+    # Only the folder mtime is checked on a hit, so in-place edits need refresh
+    assert get_folder_manifest(folder, db_path=db_path)[0] == first
+    second = get_folder_manifest(folder, refresh=True, db_path=db_path)[0]
+    assert second["size_bytes"] == 6
+    assert second["sha256"] != first["sha256"]
+
+
+def test_added_and_removed_files(tmp_path):
+    folder = tmp_path / "365"
+    folder.mkdir()
+    (folder / "Lease.docx").write_bytes(b"lease")
+    db_path = str(tmp_path / "manifest.sqlite")
+    assert len(get_folder_manifest(folder, db_path=db_path)) == 1
+
+    (folder / "Lease.docx").unlink()
+    (folder / "Tenant Contact Xena.JPG").write_bytes(b"jpg")
+    files = get_folder_manifest(folder, db_path=db_path)
+    assert [file_info["doc_type"] for file_info in files] == ["contact"]
+    assert plan_extraction(files) == []
+
+
+def test_refresh_does_not_lock_out_other_writers(tmp_path, monkeypatch):
+    folder = tmp_path / "623"
+    folder.mkdir()
+    (folder / "Ledger.pdf").write_bytes(b"ledger")
+    (folder / "Invoice.pdf").write_bytes(b"invoice")
+    db_path = str(tmp_path / "manifest.sqlite")
+    monkeypatch.setattr(manifest, "MANIFEST_LOCK_TIMEOUT_S", 0.1)
+
+    def inspect_while_another_process_writes(file_path, extension):
+        store_cached_text(file_path.name, "ocr", "text", db_path=db_path)
+        return 1, False
+
+    monkeypatch.setattr(
+        manifest, "inspect_document", inspect_while_another_process_writes
+    )
+    assert len(get_folder_manifest(folder, db_path=db_path)) == 2
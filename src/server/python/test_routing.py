@@ -0,0 +1,27 @@
+from routing import keyword_agreement, keyword_coverage
+
+
+def test_short_keywords_match_whole_words():
+    assert keyword_coverage("Gasket replacement") is True
+    assert keyword_coverage("Gas bill") is False
+    assert keyword_coverage("Risk assessment") is None
+    assert keyword_coverage("RIS fee") is False
+    assert keyword_coverage("Petition filing") is None
+    assert keyword_coverage("Pet fees") is False
+
+
+def test_keyword_coverage_ambiguous_when_both_match():
+    assert keyword_coverage("Carpet cleaning") is True
+    assert keyword_coverage("Water damage repair") is None
+    assert keyword_coverage("Landscaping") is None
+
+
+def test_keyword_agreement_scores_clear_cut_charges_only():
+    charge_items = [
+        {"description": "Carpet cleaning"},
+        {"description": "Utilities"},
+        {"description": "Landscaping"},
+    ]
+    decisions = [{"covered": True}, {"covered": True}, {"covered": False}]
+    assert keyword_agreement(charge_items, decisions) == 0.5
+    assert keyword_agreement(charge_items[2:], decisions[2:]) == 1.0
@@ -11,62 +11,98 @@ from mistralai import Mistral, DocumentURLChunk
 from mistralai.extra import response_format_from_pydantic_model
 import tempfile
 import os
+import sqlite3
+import time
 from dynamic_analysis import create_analysis_class
+from manifest import (
+    get_folder_manifest,
+    plan_extraction,
+    get_cached_text,
+    store_cached_text,
+    load_call_latencies,
+    store_call_latency,
+    LATENCY_WINDOW,
+)
+from ledger_extractors import get_ledger_extractor, extract_ledger_charges
+from hedging import LatencyTracker, hedged_call, remaining_time
 import json
 
 # API Keys
 ANTHROPIC_API_KEY = "sk-ant-REDACTED"
 MISTRAL_API_KEY = "hnEcbqbI4cumUHOY8yew25sLjLG1Yoyb"
 
+# OCR deadlines: hard cap per call, hedge once a call runs past the observed p95
+OCR_CALL_TIMEOUT_S = 90
+OCR_HEDGE_PERCENTILE = 0.95
+OCR_DEFAULT_HEDGE_AFTER_S = 30
+# Longer PDFs are clipped to their first pages before OCR
+OCR_MAX_PAGES = 8
+
+
+def create_ocr_latency_tracker(call_name: str) -> LatencyTracker:
+    # Samples persist in the manifest--each estimate.py run only sees a handful of
+    # calls. They're loaded on the first OCR call so importing utils never touches it
+    return LatencyTracker(
+        hedge_percentile=OCR_HEDGE_PERCENTILE,
+        window=LATENCY_WINDOW,
+        default_hedge_after_s=OCR_DEFAULT_HEDGE_AFTER_S,
+        load_samples=lambda: load_call_latencies(call_name),
+        on_record=lambda latency_s: store_call_latency(call_name, latency_s),
+    )
+
+
+# Annotation and plain text OCR calls differ in latency, so each has its own p95
+ocr_latency_tracker = create_ocr_latency_tracker("mistral_ocr")
+ocr_text_latency_tracker = create_ocr_latency_tracker("mistral_ocr_text")
+
+
+def process_ocr(client: Mistral, call_deadline: float, **kwargs):
+    """client.ocr.process, timed out at call_deadline (a time.monotonic() value).
+
+    A hedge sent later only gets the time left, so it can't outlive the claim.
+    """
+    timeout_ms = max(int((call_deadline - time.monotonic()) * 1000), 1)
+    return client.ocr.process(timeout_ms=timeout_ms, **kwargs)
+
 
 def analyze_individual_document_for_charges_ocr(
-    file_path: str, custom_analysis_class=None
+    file_path: str,
+    custom_analysis_class=None,
+    page_count: Optional[int] = None,
+    deadline: Optional[float] = None,
 ) -> Dict[str, Any]:
-    """Analyze document using Mistral OCR with document annotations."""
+    """Analyze document using Mistral OCR with document annotations.
+
+    The OCR call is hedged and bounded by OCR_CALL_TIMEOUT_S and the optional
+    claim deadline (a time.monotonic() value).
+    """
     temp_pdf_path = None
     try:
-        file_path_obj = Path(file_path)
-        file_extension = file_path_obj.suffix.lower()
-
-        # Clip PDF if >8 pages
-        pdf_to_process = file_path
-        if file_extension == ".pdf" and count_pdf_pages(file_path) > 8:
-            temp_fd, temp_pdf_path = tempfile.mkstemp(suffix=".pdf", prefix="clipped_")
-            os.close(temp_fd)
-            pdf_to_process = temp_pdf_path
-            clip_pdf_to_pages(file_path, pdf_to_process, max_pages=8)
-
-        # Encode to base64
-        if file_extension == ".pdf":
-            base64_data = encode_pdf_to_base64(pdf_to_process)
-            document_url = f"data:application/pdf;base64,{base64_data}"
-        elif file_extension in [".jpg", ".jpeg", ".png", ".tiff", ".bmp"]:
-            with open(file_path, "rb") as f:
-                import base64
-
-                base64_data = base64.b64encode(f.read()).decode("utf-8")
-            mime_type = (
-                f"image/{file_extension[1:]}"
-                if file_extension != ".jpg"
-                else "image/jpeg"
-            )
-            document_url = f"data:{mime_type};base64,{base64_data}"
-        elif file_extension == ".docx":
-            with open(file_path, "rb") as f:
-                import base64
-
-                base64_data = base64.b64encode(f.read()).decode("utf-8")
-            document_url = f"data:application/vnd.openxmlformats-officedocument.wordprocessingml.document;base64,{base64_data}"
-        else:
+        temp_pdf_path = clip_for_ocr(file_path, page_count)
+        document_url = build_document_url(file_path, temp_pdf_path)
+        if not document_url:
             return {
                 "has_itemized_charges": False,
                 "charge_items": [],
                 "error": f"Unsupported file type",
             }
 
+        timeout_s = ocr_timeout(deadline)
+        if timeout_s <= 0:
+            return {
+                "has_itemized_charges": False,
+                "charge_items": [],
+                "error": "Claim deadline passed before OCR",
+            }
+
         # Process with Mistral OCR
         client = Mistral(api_key=MISTRAL_API_KEY)
-        response = client.ocr.process(
+        response = hedged_call(
+            process_ocr,
+            client,
+            time.monotonic() + timeout_s,
+            tracker=ocr_latency_tracker,
+            timeout_s=timeout_s,
             model="mistral-ocr-latest",
             document=DocumentURLChunk(document_url=document_url),
             document_annotation_format=response_format_from_pydantic_model(
@@ -105,6 +141,13 @@ def analyze_individual_document_for_charges_ocr(
                 "error": "No annotation data found",
             }
 
+    except TimeoutError as e:
+        print(f"OCR timed out for {file_path}: {e}")
+        return {
+            "has_itemized_charges": False,
+            "charge_items": [],
+            "error": f"OCR timed out: {str(e)}",
+        }
     except Exception as e:
         return {
             "has_itemized_charges": False,
@@ -117,6 +160,108 @@ def analyze_individual_document_for_charges_ocr(
             os.unlink(temp_pdf_path)
 
 
+def clip_for_ocr(file_path: str, page_count: Optional[int] = None) -> Optional[str]:
+    """Temp copy of a PDF clipped to OCR_MAX_PAGES, or None if it's short enough.
+
+    The page count comes from the manifest when known. The caller deletes the copy.
+    """
+    if Path(file_path).suffix.lower() != ".pdf":
+        return None
+    if page_count is None:
+        page_count = count_pdf_pages(file_path)
+    if page_count <= OCR_MAX_PAGES:
+        return None
+    temp_fd, temp_pdf_path = tempfile.mkstemp(suffix=".pdf", prefix="clipped_")
+    os.close(temp_fd)
+    clip_pdf_to_pages(file_path, temp_pdf_path, max_pages=OCR_MAX_PAGES)
+    return temp_pdf_path
+
+
+def build_document_url(file_path: str, source_path: Optional[str] = None):
+    """Encode a claim file as a data URL for Mistral OCR (None if unsupported)."""
+    file_extension = Path(file_path).suffix.lower()
+    if file_extension == ".pdf":
+        base64_data = encode_pdf_to_base64(source_path or file_path)
+        return f"data:application/pdf;base64,{base64_data}"
+    elif file_extension in [".jpg", ".jpeg", ".png", ".tiff", ".bmp"]:
+        with open(file_path, "rb") as f:
+            base64_data = base64.b64encode(f.read()).decode("utf-8")
+        mime_type = (
+            f"image/{file_extension[1:]}" if file_extension != ".jpg" else "image/jpeg"
+        )
+        return f"data:{mime_type};base64,{base64_data}"
+    elif file_extension == ".docx":
+        with open(file_path, "rb") as f:
+            base64_data = base64.b64encode(f.read()).decode("utf-8")
+        return f"data:application/vnd.openxmlformats-officedocument.wordprocessingml.document;base64,{base64_data}"
+    return None
+
+
+def ocr_timeout(deadline: Optional[float] = None) -> float:
+    """Per-call OCR timeout, shortened to whatever is left of the claim deadline."""
+    time_left = remaining_time(deadline)
+    if time_left is None:
+        return OCR_CALL_TIMEOUT_S
+    return min(OCR_CALL_TIMEOUT_S, time_left)
+
+
+def get_document_text(
+    file_info: Dict[str, Any], deadline: Optional[float] = None
+) -> Optional[str]:
+    """Text of a claim file from its text layer, or a single plain OCR pass.
+
+    Either is cached in the manifest by content hash, so a ledger is only
+    read or OCR'd once.
+    """
+    # The cache is best effort--a locked or unreadable manifest means a re-read
+    try:
+        cached_text = get_cached_text(file_info["sha256"])
+    except sqlite3.Error as e:
+        print(f"Failed to read cached text: {e}")
+        cached_text = None
+    if cached_text is not None:
+        return cached_text
+
+    temp_pdf_path = None
+    try:
+        if file_info.get("has_text_layer") and file_info["extension"] == ".pdf":
+            with open(file_info["path"], "rb") as file:
+                pdf_reader = PdfReader(file)
+                text = "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
+            source = "text_layer"
+        else:
+            # Clipped like the annotation pass, so a long scan can't stall the claim
+            temp_pdf_path = clip_for_ocr(file_info["path"], file_info.get("page_count"))
+            document_url = build_document_url(file_info["path"], temp_pdf_path)
+            timeout_s = ocr_timeout(deadline)
+            if not document_url or timeout_s <= 0:
+                return None
+            client = Mistral(api_key=MISTRAL_API_KEY)
+            response = hedged_call(
+                process_ocr,
+                client,
+                time.monotonic() + timeout_s,
+                tracker=ocr_text_latency_tracker,
+                timeout_s=timeout_s,
+                model="mistral-ocr-latest",
+                document=DocumentURLChunk(document_url=document_url),
+            )
+            text = "\n".join(page.markdown for page in response.pages)
+            source = "ocr"
+    except Exception as e:
+        print(f"Error reading text from {file_info['path']}: {e}")
+        return None
+    finally:
+        if temp_pdf_path and os.path.exists(temp_pdf_path):
+            os.unlink(temp_pdf_path)
+
+    try:
+        store_cached_text(file_info["sha256"], source, text)
+    except sqlite3.Error as e:
+        print(f"Failed to cache text for {file_info['path']}: {e}")
+    return text
+
+
 def count_pdf_pages(file_path: str) -> int:
     try:
         with open(file_path, "rb") as file:
@@ -172,22 +317,9 @@ def update_database_result(row_id, result_value):
         print(f"Database update failed: {e}")
 
 
-def read_folder_contents(folder_path):
-    folder_path = Path(folder_path)
-
-    files_info = []
-
-    for file_path in folder_path.iterdir():
-        if file_path.is_file():
-            file_info = {
-                "name": file_path.name,
-                "path": str(file_path),
-                "extension": file_path.suffix.lower(),
-                "size_bytes": file_path.stat().st_size,
-            }
-            files_info.append(file_info)
-
-    return files_info
+def read_folder_contents(folder_path, refresh=False):
+    # Served from the claim manifest--only changed folders are re-walked
+    return get_folder_manifest(folder_path, refresh=refresh)
 
 
 def read_security_deposit_claims():
@@ -269,30 +401,34 @@ def get_charge_items(
     folder_info,
     claim_amount,
     claim_data,
+    deadline=None,
 ):
     charge_items = []
     found_itemized_doc = False
     best_diff = float("inf")
 
-    for file_info in folder_info:
-        # Analyze document with OCR for charges only
-        if claim_data.get("Property Management Company", "") == "Excalibur Homes" and (
-            "ledger" in file_info["path"].lower()
-            or "statement" in file_info["path"].lower()
-        ):
-            charge_analysis = analyze_individual_document_for_charges_ocr(
-                file_info["path"], create_analysis_class("Excalibur Homes")
-            )
-        elif (
-            claim_data.get("Property Management Company", "") == "Pure Operating LLC"
-            and "ledger" in file_info["path"].lower()
-        ):
-            charge_analysis = analyze_individual_document_for_charges_ocr(
-                file_info["path"], create_analysis_class("Pure Operating LLC")
-            )
-        else:
+    for file_info in plan_extraction(folder_info):
+        time_left = remaining_time(deadline)
+        if time_left is not None and time_left <= 0:
+            print("Claim deadline reached, skipping remaining documents")
+            break
+
+        # Known ledger formats are walked in code; the annotation model is the fallback
+        mgmt_company = claim_data.get("Property Management Company", "")
+        extractor = get_ledger_extractor(mgmt_company, file_info["path"])
+        charge_analysis = None
+        if extractor:
+            ledger_text = get_document_text(file_info, deadline)
+            if ledger_text:
+                charge_analysis = extract_ledger_charges(extractor, ledger_text)
+
+        if charge_analysis is None:
+            # Analyze document with OCR for charges only
             charge_analysis = analyze_individual_document_for_charges_ocr(
-                file_info["path"], create_analysis_class()
+                file_info["path"],
+                create_analysis_class(mgmt_company if extractor else ""),
+                file_info.get("page_count"),
+                deadline,
             )
 
         # Check for itemized charges